@@ -6,7 +6,7 @@ Simple CLI script to test the model interface
 
 import sys
 import os
-from model_interface import ModelInterface
+from model_interface import get_interface
 
 def test_single_client():
     """Test with a single client"""
@@ -14,11 +14,11 @@ def test_single_client():
     
     # Initialize interface
     print("Инициализация интерфейса модели...")
-    interface = ModelInterface()
+    interface = get_interface()
     print(f"✅ Интерфейс инициализирован (ML модель: {'доступна' if interface.ml_model_available else 'недоступна'})\n")
     
     # Load data
-    from data_loader import load_clients, load_client_tables
+    from data_loader import load_clients, load_client_tables, get_client_tx, get_client_tr
     print("Загрузка данных клиентов...")
     clients = load_clients("data/clients.csv")
     tables = load_client_tables()
@@ -35,13 +35,13 @@ def test_single_client():
     print(f"  Средний остаток: {client_row['avg_monthly_balance_KZT']:,.0f} ₸\n")
     
     # Get client data
-    tx = tables.get(client_id, {}).get("tx", None)
-    tr = tables.get(client_id, {}).get("tr", None)
+    tx = get_client_tx(tables, client_id)
+    tr = get_client_tr(tables, client_id)
     
     if tx is not None and not tx.empty:
         print(f"  Транзакций: {len(tx)}")
         print(f"  Общая сумма трат: {tx['amount'].sum():,.0f} ₸")
-        print(f"  Топ категории: {', '.join(tx.groupby('category')['amount'].sum().nlargest(3).index.tolist())}")
+        print(f"  Топ категории: {', '.join(tx.groupby('category', observed=True)['amount'].sum().nlargest(3).index.tolist())}")
     else:
         print("  Нет данных о транзакциях")
     
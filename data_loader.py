@@ -1,33 +1,186 @@
 # -*- coding: utf-8 -*-
-import os, glob
+import os, glob, re, hashlib
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd
-from typing import Dict, Tuple
+from typing import Dict, Optional, Tuple
+
+# явные типы и только нужные колонки: без вывода типов, категории вместо object-строк
+CLIENT_DTYPES = {"client_code": "int64", "status": "category", "city": "category", "avg_monthly_balance_KZT": "float64"}
+TX_DTYPES = {"date": "datetime64[ns]", "category": "category", "amount": "float64", "currency": "category", "client_code": "int64"}
+TR_DTYPES = {"date": "datetime64[ns]", "type": "category", "direction": "category", "amount": "float64", "currency": "category", "client_code": "int64"}
+_DTYPES = {"tx": TX_DTYPES, "tr": TR_DTYPES}
+DATE_DTYPE = "datetime64[ns]"
 
 def load_clients(path="data/clients.csv") -> pd.DataFrame:
-    df = pd.read_csv(path)
+    df = pd.read_csv(path, dtype=CLIENT_DTYPES)
     return df
 
-def _extract_id(p: str) -> int:
-    base = os.path.basename(p)
+_CID_RE = re.compile(r"client_(\d+)_")
+
+def _extract_id(p: str) -> Optional[int]:
+    m = _CID_RE.search(os.path.basename(p))
+    return int(m.group(1)) if m else None
+
+def _cache_path(pattern: str, kind: str) -> str:
+    # в имени — хэш маски: у разных наборов файлов (3m/6m и т.п.) свои кэши
+    key = hashlib.md5(os.path.basename(pattern).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(os.path.dirname(pattern), f"_cache_{kind}_{key}.parquet")
+
+def _sources(paths) -> Dict[str, float]:
+    return {p: os.path.getmtime(p) for _, p in paths}
+
+def _read_cache(cache_path: str, sources: Dict[str, float], dtypes: Dict[str, str]):
+    if not os.path.exists(cache_path):
+        return None
     try:
-        return int(base.split("_")[1])
-    except Exception:
+        df = pd.read_parquet(cache_path)
+    except (ImportError, OSError, ValueError, TypeError):
         return None
-
-def load_client_tables(tx_glob="data/client_*_transactions_3m.csv",
-                       tr_glob="data/client_*_transfers_3m.csv") -> Dict[int, Dict[str, pd.DataFrame]]:
-    data = {}
-    for p in glob.glob(tx_glob):
+    # кэш валиден, только если собран ровно из тех же CSV с теми же mtime:
+    # добавленный, удалённый или изменённый файл — пересборка
+    if df.attrs.get("sources") != sources:
+        return None
+    # кэш старого формата (даты строками) пересобираем
+    if any(c in df.columns and str(df[c].dtype) != t for c, t in dtypes.items() if t == DATE_DTYPE):
+        return None
+    # один столбцовый фрейм на все клиенты; клиенту соответствует непрерывный диапазон строк,
+    # поэтому таблицы клиентов — срезы по границам, без groupby
+    codes = df["client_code"].to_numpy()
+    if len(codes) > 1 and not (codes[1:] >= codes[:-1]).all():
+        df = df.sort_values("client_code", kind="stable", ignore_index=True)
+        codes = df["client_code"].to_numpy()
+    cids, starts = np.unique(codes, return_index=True)
+    ends = np.append(starts[1:], len(codes))
+    ranges = {int(cid): (a, b) for cid, a, b in zip(cids, starts, ends)}
+    # клиенты в порядке исходников, как при чтении CSV; у CSV из одного заголовка строк в кэше нет —
+    # для них пустой фрейм с теми же колонками и типами
+    empty = df.iloc[:0].reset_index(drop=True)
+    tables = {}
+    for p in sources:
         cid = _extract_id(p)
-        if cid is None: 
+        a, b = ranges.get(cid, (0, 0))
+        tables[cid] = df.iloc[a:b].reset_index(drop=True) if b > a else empty.copy()
+    return tables
+
+def _read_csv(path: str, dtypes: Dict[str, str]) -> pd.DataFrame:
+    df = pd.read_csv(path, usecols=lambda c: c in dtypes,
+                     dtype={c: t for c, t in dtypes.items() if t != DATE_DTYPE})
+    # даты разбираем один раз при загрузке, дальше везде .dt без повторного to_datetime
+    for c, t in dtypes.items():
+        if t == DATE_DTYPE and c in df.columns:
+            df[c] = pd.to_datetime(df[c], errors="coerce")
+    return df
+
+def _share_categories(frames, dtypes: Dict[str, str]) -> None:
+    # у каждого CSV свой набор категорий; приводим все фреймы к общему CategoricalDtype,
+    # чтобы коды совпадали у всех клиентов, а concat и isin работали по целым кодам
+    for col, dtype in dtypes.items():
+        if dtype != "category":
             continue
-        df = pd.read_csv(p)
-        data.setdefault(cid, {})["tx"] = df
+        cats = sorted(set().union(*(df[col].cat.categories for df in frames if col in df.columns)))
+        shared = pd.CategoricalDtype(cats)
+        for df in frames:
+            if col in df.columns:
+                df[col] = df[col].astype(shared)
+
+def _concat(tables: Dict[int, pd.DataFrame], dtypes: Dict[str, str]) -> pd.DataFrame:
+    df = pd.concat([t.assign(client_code=cid) for cid, t in tables.items()], ignore_index=True)
+    # у файлов разные наборы категорий, и concat откатывает такие колонки в object
+    for col, dtype in dtypes.items():
+        if dtype == "category" and col in df.columns:
+            df[col] = df[col].astype("category")
+    return df
+
+def _write_cache(cache_path: str, tables: Dict[int, pd.DataFrame], dtypes: Dict[str, str],
+                 sources: Dict[str, float]) -> None:
+    if not tables:
+        return
+    df = _concat(tables, dtypes).sort_values("client_code", kind="stable", ignore_index=True)
+    # список исходников с mtime уходит в метаданные parquet (df.attrs)
+    df.attrs["sources"] = sources
+    try:
+        df.to_parquet(cache_path, index=False)
+    except (ImportError, OSError, ValueError, TypeError):
+        # без pyarrow (или при ошибке записи) просто работаем с CSV
+        if os.path.exists(cache_path):
+            os.remove(cache_path)
 
-    for p in glob.glob(tr_glob):
+def _read_tables(pattern: str, dtypes: Dict[str, str], cache_path: str = None) -> Dict[int, pd.DataFrame]:
+    paths = []
+    for p in glob.glob(pattern):
         cid = _extract_id(p)
         if cid is None:
             continue
-        df = pd.read_csv(p)
-        data.setdefault(cid, {})["tr"] = df
+        paths.append((cid, p))
+    sources = _sources(paths) if cache_path else None
+    if cache_path and paths:
+        cached = _read_cache(cache_path, sources, dtypes)
+        if cached is not None:
+            return cached
+    # парсер pandas отпускает GIL, поэтому мелкие CSV читаем параллельно
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as ex:
+        frames = list(ex.map(lambda p: _read_csv(p, dtypes), [p for _, p in paths]))
+    _share_categories(frames, dtypes)
+    tables = {cid: df for (cid, _), df in zip(paths, frames)}
+    if cache_path:
+        _write_cache(cache_path, tables, dtypes, sources)
+    return tables
+
+def load_client_tables(tx_glob="data/client_*_transactions_3m.csv",
+                       tr_glob="data/client_*_transfers_3m.csv",
+                       use_cache: bool = True) -> Dict[int, Dict[str, pd.DataFrame]]:
+    data = {}
+    for kind, pattern in (("tx", tx_glob), ("tr", tr_glob)):
+        cache_path = _cache_path(pattern, kind) if use_cache else None
+        for cid, df in _read_tables(pattern, _DTYPES[kind], cache_path).items():
+            data.setdefault(cid, {})[kind] = df
     return data
+
+def load_client(cid: int,
+                tx_glob="data/client_*_transactions_3m.csv",
+                tr_glob="data/client_*_transfers_3m.csv") -> Dict[str, pd.DataFrame]:
+    """Таблицы одного клиента {"tx": ..., "tr": ...} — читаем только его CSV, без загрузки остальных."""
+    data = {}
+    for kind, pattern in (("tx", tx_glob), ("tr", tr_glob)):
+        # файл ищем так же, как load_client_tables: glob + id из имени (client_007_... тоже клиент 7);
+        # при нескольких совпадениях берём последний, как при сборке словаря там
+        paths = [p for p in glob.glob(pattern) if _extract_id(p) == cid]
+        if paths:
+            data[kind] = _read_csv(paths[-1], _DTYPES[kind])
+    return data
+
+def build_cache(tx_glob="data/client_*_transactions_3m.csv",
+                tr_glob="data/client_*_transfers_3m.csv") -> list:
+    """Пересобрать parquet-кэш для заданных масок из CSV заранее; возвращает пути собранных файлов."""
+    built = []
+    for kind, pattern in (("tx", tx_glob), ("tr", tr_glob)):
+        cache_path = _cache_path(pattern, kind)
+        # вместе с текущим удаляем и кэш старого формата без ключа маски
+        for p in (cache_path, os.path.join(os.path.dirname(pattern), f"_cache_{kind}.parquet")):
+            if os.path.exists(p):
+                os.remove(p)
+        _read_tables(pattern, _DTYPES[kind], cache_path)
+        if os.path.exists(cache_path):
+            built.append(cache_path)
+    return built
+
+# общий пустой фрейм для клиентов без транзакций/переводов, чтобы не собирать новый на каждый промах
+EMPTY_TX = pd.DataFrame({c: pd.Series(dtype=t) for c, t in TX_DTYPES.items()})
+EMPTY_TR = pd.DataFrame({c: pd.Series(dtype=t) for c, t in TR_DTYPES.items()})
+
+def get_client_tx(tables: Dict[int, Dict[str, pd.DataFrame]], cid: int) -> pd.DataFrame:
+    return tables.get(cid, {}).get("tx", EMPTY_TX)
+
+def get_client_tr(tables: Dict[int, Dict[str, pd.DataFrame]], cid: int) -> pd.DataFrame:
+    return tables.get(cid, {}).get("tr", EMPTY_TR)
+
+# все таблицы одного вида ("tx"/"tr") одним фреймом с ключом client_code — для батчевых groupby
+def concat_client_tables(tables: Dict[int, Dict[str, pd.DataFrame]], kind: str = "tx") -> pd.DataFrame:
+    frames = {cid: t[kind] for cid, t in tables.items() if kind in t}
+    if not frames:
+        return pd.DataFrame(columns=["client_code"])
+    return _concat(frames, _DTYPES[kind])
+
+if __name__ == "__main__":
+    print("Saved:", ", ".join(build_cache()) or "nothing (no CSV or no pyarrow)")
@@ -7,8 +7,8 @@ Showcases all features of the model interface
 
 import sys
 import pandas as pd
-from model_interface import ModelInterface
-from data_loader import load_clients, load_client_tables
+from model_interface import get_interface
+from data_loader import load_clients, load_client_tables, get_client_tx, get_client_tr
 
 def demo_interface():
     """Comprehensive demonstration of the interface"""
@@ -17,7 +17,7 @@ def demo_interface():
     
     # Step 1: Initialize Interface
     print("\n📋 Шаг 1: Инициализация интерфейса")
-    interface = ModelInterface()
+    interface = get_interface()
     
     print(f"✅ ML модель: {'Доступна' if interface.ml_model_available else 'Недоступна (используем правила)'}")
     print(f"✅ Продуктов в каталоге: {len(interface.product_classes)}")
@@ -29,8 +29,8 @@ def demo_interface():
     tables = load_client_tables()
     
     print(f"✅ Загружено клиентов: {len(clients)}")
-    print(f"✅ Клиентов с транзакциями: {len([c for c in tables.keys() if 'tx' in tables[c]])}")
-    print(f"✅ Клиентов с переводами: {len([c for c in tables.keys() if 'tr' in tables[c]])}")
+    print(f"✅ Клиентов с транзакциями: {sum(1 for t in tables.values() if 'tx' in t)}")
+    print(f"✅ Клиентов с переводами: {sum(1 for t in tables.values() if 'tr' in t)}")
     
     # Step 3: Analyze Product Distribution
     print("\n📈 Шаг 3: Анализ рекомендаций (первые 10 клиентов)")
@@ -41,8 +41,8 @@ def demo_interface():
         client_row = clients.iloc[i]
         client_id = int(client_row['client_code'])
         
-        tx = tables.get(client_id, {}).get("tx", pd.DataFrame())
-        tr = tables.get(client_id, {}).get("tr", pd.DataFrame())
+        tx = get_client_tx(tables, client_id)
+        tr = get_client_tr(tables, client_id)
         
         best_product, confidence = interface.get_best_product(client_row, tx, tr, "hybrid")
         
@@ -59,20 +59,14 @@ def demo_interface():
     print("\n🔍 Шаг 4: Детальный анализ клиента")
     
     # Pick an interesting client (with good transaction data)
-    best_client_idx = 0
-    max_transactions = 0
-    
-    for i, client_row in clients.iterrows():
-        client_id = int(client_row['client_code'])
-        tx = tables.get(client_id, {}).get("tx", pd.DataFrame())
-        if len(tx) > max_transactions:
-            max_transactions = len(tx)
-            best_client_idx = i
+    tx_counts = pd.Series({cid: len(t["tx"]) for cid, t in tables.items() if "tx" in t}, dtype="int64")
+    tx_counts = tx_counts.reindex(clients['client_code'], fill_value=0)
+    best_client_idx = int(tx_counts.to_numpy().argmax()) if len(tx_counts) else 0
     
     client_row = clients.iloc[best_client_idx]
     client_id = int(client_row['client_code'])
-    tx = tables.get(client_id, {}).get("tx", pd.DataFrame())
-    tr = tables.get(client_id, {}).get("tr", pd.DataFrame())
+    tx = get_client_tx(tables, client_id)
+    tr = get_client_tr(tables, client_id)
     
     print(f"Выбран клиент: {client_row['name']} (ID: {client_id})")
     print(f"  Статус: {client_row['status']}")
@@ -83,7 +77,7 @@ def demo_interface():
     if not tx.empty:
         print(f"  Транзакций: {len(tx)}")
         print(f"  Общие траты: {tx['amount'].sum():,.0f} ₸")
-        top_cats = tx.groupby('category')['amount'].sum().nlargest(3)
+        top_cats = tx.groupby('category', observed=True)['amount'].sum().nlargest(3)
         print(f"  Топ категории: {', '.join(top_cats.index.tolist())}")
     
     # Step 5: Compare All Methods
@@ -117,8 +111,8 @@ def demo_interface():
         client_row = clients.iloc[i]
         client_id = int(client_row['client_code'])
         
-        tx = tables.get(client_id, {}).get("tx", pd.DataFrame())
-        tr = tables.get(client_id, {}).get("tr", pd.DataFrame())
+        tx = get_client_tx(tables, client_id)
+        tr = get_client_tr(tables, client_id)
         
         result = interface.generate_push_notification(
             client_row, tx, tr, 
@@ -160,7 +154,7 @@ def demo_interface():
 
 def show_available_products():
     """Show all available products and their descriptions"""
-    interface = ModelInterface()
+    interface = get_interface()
     
     print("📦 ДОСТУПНЫЕ ПРОДУКТЫ")
     print("=" * 40)
@@ -1,144 +1,283 @@
 # -*- coding: utf-8 -*-
-import argparse, os, json, yaml
+import argparse, csv, os, json, yaml
+from typing import NamedTuple
+import multiprocessing as mp
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from itertools import islice
+import numpy as np
 import pandas as pd
 from tqdm import tqdm
-from data_loader import load_clients, load_client_tables
-from scoring import compute_expected_benefits, rank_products
-from prompts import SYSTEM_PROMPT, build_user_prompt, format_kzt, month_of_last_full_period
-from validator import validate_push, autocorrect
+from data_loader import load_clients, load_client_tables, concat_client_tables, get_client_tx, get_client_tr
+from scoring import compute_expected_benefits, rank_products, build_cat_sets, ScoringCfg
+from prompts import SYSTEM_PROMPT, build_user_prompt, format_kzt, month_of_last_full_period, month_of_last_full_period_by_client, RU_MONTHS_GEN
+from validator import validate_push_batch, autocorrect
 from ollama_client import generate_with_guardrails
 
+try:
+    import orjson
+except ImportError:  # orjson опционален, без него пишем через стандартный json
+    orjson = None
+
 OUT_DIR = "out"
 INTER_DIR = "intermediate"
+# клиентов на пачку в main: столько одновременно держим в памяти между скорингом и записью
+_BATCH_SIZE = 256
 os.makedirs(OUT_DIR, exist_ok=True)
 os.makedirs(INTER_DIR, exist_ok=True)
 
-def build_behavior(tx: pd.DataFrame) -> dict:
-    if tx is None or tx.empty:
-        return {"top_categories": [], "taxi_count": 0, "travel_sum": 0.0}
-    cat_spend = tx.groupby("category")["amount"].sum().sort_values(ascending=False).to_dict()
-    top3 = list(cat_spend)[:3]
-    taxi_count = int((tx["category"] == "Такси").sum()) if "category" in tx.columns else 0
-    travel_sum = float(tx.loc[tx["category"].isin(["Путешествия","Такси","Отели"]), "amount"].sum())
-    return {"top_categories": top3, "taxi_count": taxi_count, "travel_sum": travel_sum}
+def _plain(obj):
+    # NaN/inf -> None (null), numpy-скаляры -> python: одинаковый результат с orjson и без него
+    if isinstance(obj, dict):
+        return {k: _plain(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_plain(v) for v in obj]
+    if isinstance(obj, (float, np.floating)):
+        return float(obj) if np.isfinite(obj) else None
+    if isinstance(obj, np.integer):
+        return int(obj)
+    return obj
+
+def _jsonl(obj) -> bytes:
+    obj = _plain(obj)
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(obj, ensure_ascii=False, separators=(",", ":"), allow_nan=False) + "\n").encode("utf-8")
+
+PRODUCT_TO_CTA_KEY = {
+    "Карта для путешествий": "travel",
+    "Премиальная карта": "premium",
+    "Кредитная карта": "credit",
+    "Обмен валют": "fx",
+    "Депозит Мультивалютный": "deposit",
+    "Депозит Сберегательный": "deposit",
+    "Депозит Накопительный": "deposit",
+    "Инвестиции": "invest",
+    "Золотые слитки": "gold",
+}
+
+TRAVEL_CATS = frozenset(["Путешествия", "Такси", "Отели"])
+
+def _category_mask(category: pd.Series, cats: frozenset) -> np.ndarray:
+    if isinstance(category.dtype, pd.CategoricalDtype):
+        # сравниваем целочисленные коды категорий, а не строки
+        codes = [i for i, c in enumerate(category.cat.categories) if c in cats]
+        return np.isin(category.cat.codes.to_numpy(), codes)
+    return category.isin(cats).to_numpy()
+
+# Шаблоны фолбэка: product -> (name, month_name, benefit_txt, behavior) -> текст пуша
+def _travel_push(name, month_name, benefit_txt, behavior):
+    return f"{name}, в {month_name} вы часто ездите и пользуетесь такси. С картой для путешествий вернётся до {benefit_txt}. Открыть карту."
+
+def _premium_push(name, month_name, benefit_txt, behavior):
+    return f"{name}, у вас стабильно высокий остаток и траты в ресторанах. Премиальная карта даст повышенный кешбэк и бесплатные снятия. Оформить сейчас."
+
+def _credit_push(name, month_name, benefit_txt, behavior):
+    cats = ', '.join(behavior.get('top_categories', [])[:3]) or "любимых категориях"
+    return f"{name}, ваши топ-категории — {cats}. Кредитная карта даёт до 10% кешбэка и на онлайн-сервисы. Оформить карту."
+
+def _fx_push(name, month_name, benefit_txt, behavior):
+    return f"{name}, вы часто платите в валюте. В приложении выгодный обмен без комиссии и авто-покупка по целевому курсу. Настроить обмен."
+
+def _deposit_push(name, month_name, benefit_txt, behavior):
+    return f"{name}, у вас остаются свободные средства. Разместите их на вкладе — удобно копить и получать вознаграждение. Открыть вклад."
+
+def _invest_push(name, month_name, benefit_txt, behavior):
+    return f"{name}, попробуйте инвестиции с низким порогом входа и без комиссий на старт. Открыть счёт."
+
+def _gold_push(name, month_name, benefit_txt, behavior):
+    return f"{name}, для диверсификации можно добавить золотые слитки 999,9 пробы. Посмотреть варианты."
+
+PUSH_TEMPLATES = {
+    "Карта для путешествий": _travel_push,
+    "Премиальная карта": _premium_push,
+    "Кредитная карта": _credit_push,
+    "Обмен валют": _fx_push,
+    "Депозит Мультивалютный": _deposit_push,
+    "Депозит Сберегательный": _deposit_push,
+    "Депозит Накопительный": _deposit_push,
+    "Инвестиции": _invest_push,
+    "Золотые слитки": _gold_push,
+}
+
+def _empty_behavior() -> dict:
+    return {"top_categories": [], "taxi_count": 0, "travel_sum": 0.0}
+
+def _top_categories(cat_sums: pd.Series, k: int) -> dict:
+    # клиенты × категории; без полной сортировки: argpartition берёт k лучших, сортируем только их
+    wide = cat_sums.unstack("category")
+    vals = wide.to_numpy(dtype="float64", na_value=-np.inf)
+    k = min(k, vals.shape[1])
+    idx = np.argpartition(-vals, k - 1, axis=1)[:, :k]
+    top_vals = np.take_along_axis(vals, idx, axis=1)
+    order = np.argsort(-top_vals, axis=1, kind="stable")
+    idx = np.take_along_axis(idx, order, axis=1)
+    top_vals = np.take_along_axis(top_vals, order, axis=1)
+    cats = wide.columns.to_numpy()
+    return {
+        cid: [cats[j] for j, v in zip(row_idx, row_vals) if v > -np.inf]
+        for cid, row_idx, row_vals in zip(wide.index, idx, top_vals)
+    }
+
+def build_behaviors(all_tx: pd.DataFrame) -> dict:
+    """Поведение всех клиентов одним проходом: client_code -> {top_categories, taxi_count, travel_sum}."""
+    if all_tx is None or all_tx.empty:
+        return {}
+    by_client = all_tx["client_code"]
+    cat_sums = all_tx.groupby(["client_code", "category"], sort=False, observed=True)["amount"].sum()
+    top3 = _top_categories(cat_sums, 3)
+    # такси и поездки — одним groupby по клиенту на двухколоночном фрейме
+    per_client = pd.DataFrame({
+        "taxi_count": all_tx["category"].eq("Такси"),
+        "travel_sum": all_tx["amount"].where(_category_mask(all_tx["category"], TRAVEL_CATS), 0),
+    }).groupby(by_client, sort=False).sum()
+
+    behaviors = {}
+    for cid, taxi_count, travel_sum in zip(per_client.index, per_client["taxi_count"].to_numpy(), per_client["travel_sum"].to_numpy()):
+        behaviors[int(cid)] = {"top_categories": top3.get(cid, []), "taxi_count": int(taxi_count), "travel_sum": float(travel_sum)}
+    return behaviors
+
+class ClientJob(NamedTuple):
+    """Результат скоринга клиента — всё, что нужно для генерации и записи пуша."""
+    client: dict
+    client_code: int
+    product: str
+    expected_benefit: float
+    behavior: dict
+    ref_month: int
+    user_prompt: str
+
+_worker_cfg = None
+_worker_cat_sets = None
+_worker_scoring_cfg = None
+
+def _init_worker(cfg: dict) -> None:
+    # конфиг передаётся воркеру один раз при старте, а не с каждой задачей
+    global _worker_cfg, _worker_cat_sets, _worker_scoring_cfg
+    _worker_cfg = cfg
+    _worker_cat_sets = build_cat_sets(cfg)
+    _worker_scoring_cfg = ScoringCfg.from_rates(cfg["rates"])
+
+def score_client(payload):
+    """Скоринг одного клиента: (c, tx, tr, behavior, ref_month) -> (ranked, ClientJob)."""
+    c, tx, tr, behavior, ref_month = payload
+    cid = int(c["client_code"])
+
+    benefits, facts = compute_expected_benefits(c, tx, tr, _worker_cfg, _worker_cat_sets, _worker_scoring_cfg)
+    ranked = rank_products(benefits)
+
+    best_product = ranked[0][0] if ranked else "Инвестиции"
+    expected_benefit = benefits.get(best_product, 0.0)
+
+    # CTA
+    cta = _worker_cfg["cta"].get(PRODUCT_TO_CTA_KEY.get(best_product), "Посмотреть")
+
+    user_prompt = build_user_prompt(
+        name=c.get("name", "Клиент"),
+        status=c.get("status", ""),
+        age=int(c.get("age", 0)),
+        city=c.get("city", ""),
+        avg_balance=float(c.get("avg_monthly_balance_KZT", 0)),
+        behavior=behavior,
+        product=best_product,
+        expected_benefit=expected_benefit,
+        cta=cta,
+        ref_month=ref_month
+    )
+    return ranked, ClientJob(c, cid, best_product, expected_benefit, behavior, ref_month, user_prompt)
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--clients_csv", default="data/clients.csv")
     ap.add_argument("--model", default="none", help="Ollama model name (e.g., 'mistral:7b'). Use 'none' for template generator.")
     ap.add_argument("--config", default="config.yaml")
+    ap.add_argument("--workers", type=int, default=4, help="Parallel Ollama requests (used when --model is set).")
+    ap.add_argument("--jobs", type=int, default=1, help="Worker processes for client scoring (1 = in-process).")
     args = ap.parse_args()
 
     cfg = yaml.safe_load(open(args.config, "r", encoding="utf-8"))
 
-    clients = load_clients(args.clients_csv)
+    # сортируем один раз на входе — выходные файлы сразу идут по client_code
+    clients = load_clients(args.clients_csv).sort_values("client_code", ignore_index=True)
     tables = load_client_tables()
+    all_tx = concat_client_tables(tables, "tx")
+    behaviors = build_behaviors(all_tx)
+    ref_months = month_of_last_full_period_by_client(all_tx)
+    default_month = month_of_last_full_period(None)
+
+    if "age" in clients.columns:
+        clients["age"] = clients["age"].fillna(0).astype(int)
+
+    # словари вместо iterrows: без сборки Series на каждую строку
+    payloads = (
+        (c, get_client_tx(tables, cid), get_client_tr(tables, cid),
+         behaviors.get(cid) or _empty_behavior(), ref_months.get(cid, default_month))
+        for c, cid in ((c, int(c["client_code"])) for c in clients.to_dict("records"))
+    )
+    # скоринг клиентов независим, поэтому при --jobs > 1 раздаём его по процессам;
+    # imap (а не imap_unordered), чтобы сохранить порядок по client_code
+    pool = mp.Pool(args.jobs, initializer=_init_worker, initargs=(cfg,)) if args.jobs > 1 else None
+    if pool is None:
+        _init_worker(cfg)
+    # запросы к Ollama почти целиком ожидание ответа, поэтому перекрываем их потоками
+    ex = ThreadPoolExecutor(max_workers=max(args.workers, 1)) if args.model != "none" else None
 
-    rows, sft_lines, benefits_dump = [], [], []
-
-    for _, c in tqdm(clients.iterrows(), total=len(clients)):
-        cid = int(c["client_code"])
-        tx = tables.get(cid, {}).get("tx", pd.DataFrame(columns=["date","category","amount","currency","client_code"]))
-        tr = tables.get(cid, {}).get("tr", pd.DataFrame(columns=["date","type","direction","amount","currency","client_code"]))
-
-        benefits, facts = compute_expected_benefits(c, tx, tr, cfg)
-        ranked = rank_products(benefits)
-        ref_month = month_of_last_full_period(tx["date"] if "date" in tx.columns else pd.Series([], dtype=str))
-
-        benefits_dump.append({"client_code": cid, "ranked": ranked})
-
-        best_product = ranked[0][0] if ranked else "Инвестиции"
-        expected_benefit = benefits.get(best_product, 0.0)
-
-        # CTA
-        if best_product == "Карта для путешествий":
-            cta = cfg["cta"]["travel"]
-        elif best_product == "Премиальная карта":
-            cta = cfg["cta"]["premium"]
-        elif best_product == "Кредитная карта":
-            cta = cfg["cta"]["credit"]
-        elif best_product == "Обмен валют":
-            cta = cfg["cta"]["fx"]
-        elif best_product in {"Депозит Мультивалютный","Депозит Сберегательный","Депозит Накопительный"}:
-            cta = cfg["cta"]["deposit"]
-        elif best_product == "Инвестиции":
-            cta = cfg["cta"]["invest"]
-        elif best_product == "Золотые слитки":
-            cta = cfg["cta"]["gold"]
-        else:
-            cta = "Посмотреть"
-
-        behavior = build_behavior(tx)
-        user_prompt = build_user_prompt(
-            name=c.get("name", "Клиент"),
-            status=c.get("status", ""),
-            age=int(c.get("age", 0)) if pd.notna(c.get("age", None)) else 0,
-            city=c.get("city", ""),
-            avg_balance=float(c.get("avg_monthly_balance_KZT", 0)),
-            behavior=behavior,
-            product=best_product,
-            expected_benefit=expected_benefit,
-            cta=cta,
-            ref_month=ref_month
-        )
-
-                # --- Генерация ---
-        push = ""
-        if args.model != "none":
-            push = generate_with_guardrails(args.model, SYSTEM_PROMPT, user_prompt)
-
-        # Фолбэк на шаблон, если из модели ничего не пришло
-        if not push:
-            from prompts import format_kzt, RU_MONTHS_GEN
-            benefit_txt = format_kzt(expected_benefit) if expected_benefit and expected_benefit > 0 else ""
-            name = c.get("name","Клиент")
-            month_name = RU_MONTHS_GEN.get(ref_month, "последнем месяце")
-            if best_product == "Карта для путешествий":
-                push = f"{name}, в {month_name} вы часто ездите и пользуетесь такси. С картой для путешествий вернётся до {benefit_txt}. Открыть карту."
-            elif best_product == "Премиальная карта":
-                push = f"{name}, у вас стабильно высокий остаток и траты в ресторанах. Премиальная карта даст повышенный кешбэк и бесплатные снятия. Оформить сейчас."
-            elif best_product == "Кредитная карта":
-                cats = ', '.join(behavior.get('top_categories', [])[:3]) or "любимых категориях"
-                push = f"{name}, ваши топ-категории — {cats}. Кредитная карта даёт до 10% кешбэка и на онлайн-сервисы. Оформить карту."
-            elif best_product == "Обмен валют":
-                push = f"{name}, вы часто платите в валюте. В приложении выгодный обмен без комиссии и авто-покупка по целевому курсу. Настроить обмен."
-            elif best_product in {"Депозит Мультивалютный","Депозит Сберегательный","Депозит Накопительный"}:
-                push = f"{name}, у вас остаются свободные средства. Разместите их на вкладе — удобно копить и получать вознаграждение. Открыть вклад."
-            elif best_product == "Инвестиции":
-                push = f"{name}, попробуйте инвестиции с низким порогом входа и без комиссий на старт. Открыть счёт."
-            else:
-                push = f"{name}, для диверсификации можно добавить золотые слитки 999,9 пробы. Посмотреть варианты."
-
-        # Валидация и автокоррекция
-        chk = validate_push(push)
-        if not chk["ok"]:
-            push = autocorrect(push)
-
-
-        rows.append({"client_code": cid, "product": best_product, "push_notification": push})
-        sft_lines.append({
-            "instruction": "Сгенерируй короткое персонализированное пуш-уведомление (180–220 символов) в TOV банка, учитывая поведение клиента и пользу продукта.",
-            "input": {
-                "client_code": cid,
-                "name": c.get("name"),
-                "behavior": behavior,
-                "candidate_products": ["Карта для путешествий","Премиальная карта","Кредитная карта","Обмен валют","Кредит наличными","Депозит Мультивалютный","Депозит Сберегательный","Депозит Накопительный","Инвестиции","Золотые слитки"],
-                "chosen_product": best_product
-            },
-            "output": push
-        })
-
-    out_df = pd.DataFrame(rows).sort_values("client_code")
     out_csv = os.path.join(OUT_DIR, "push_recommendations.csv")
-    out_df.to_csv(out_csv, index=False, encoding="utf-8")
+    with pool or nullcontext(), ex or nullcontext(), \
+         open(os.path.join(INTER_DIR, "benefits.jsonl"), "wb") as fben, \
+         open(out_csv, "w", encoding="utf-8", newline="") as fcsv, \
+         open(os.path.join(OUT_DIR, "push_sft.jsonl"), "wb") as fsft, \
+         tqdm(total=len(clients)) as bar:
+        writer = csv.DictWriter(fcsv, fieldnames=["client_code", "product", "push_notification"], lineterminator="\n")
+        writer.writeheader()
+        # клиенты идут пачками: скоринг → генерация → валидация → запись; в пул пачка отдаётся целиком
+        # и забирается до следующей, поэтому и входы, и результаты держим не больше чем за одну пачку
+        while True:
+            chunk = list(islice(payloads, _BATCH_SIZE))
+            if not chunk:
+                break
+            scored = pool.imap(score_client, chunk, chunksize=32) if pool else map(score_client, chunk)
+            jobs = []
+            for ranked, job in scored:
+                fben.write(_jsonl({"client_code": job.client_code, "ranked": ranked}))
+                jobs.append(job)
+
+            # --- Генерация ---
+            if ex is not None:
+                pushes = list(ex.map(lambda up: generate_with_guardrails(args.model, SYSTEM_PROMPT, up),
+                                     [job.user_prompt for job in jobs]))
+            else:
+                pushes = [""] * len(jobs)
+
+            # Фолбэк на шаблон, если из модели ничего не пришло
+            for i, job in enumerate(jobs):
+                if not pushes[i]:
+                    eb = job.expected_benefit
+                    benefit_txt = format_kzt(eb) if eb and eb > 0 else ""
+                    name = job.client.get("name","Клиент")
+                    month_name = RU_MONTHS_GEN.get(job.ref_month, "последнем месяце")
+                    pushes[i] = PUSH_TEMPLATES.get(job.product, _gold_push)(name, month_name, benefit_txt, job.behavior)
+
+            # Валидация всей колонки пачки разом, автокоррекция — только для не прошедших
+            ok = validate_push_batch(pushes)["ok"].to_numpy()
 
-    with open(os.path.join(OUT_DIR, "push_sft.jsonl"), "w", encoding="utf-8") as f:
-        for ex in sft_lines:
-            f.write(json.dumps(ex, ensure_ascii=False) + "\n")
+            for job, push, push_ok in zip(jobs, pushes, ok):
+                if not push_ok:
+                    push = autocorrect(push)
 
-    with open(os.path.join(INTER_DIR, "benefits.jsonl"), "w", encoding="utf-8") as f:
-        for ex in benefits_dump:
-            f.write(json.dumps(ex, ensure_ascii=False) + "\n")
+                writer.writerow({"client_code": job.client_code, "product": job.product, "push_notification": push})
+                fsft.write(_jsonl({
+                    "instruction": "Сгенерируй короткое персонализированное пуш-уведомление (180–220 символов) в TOV банка, учитывая поведение клиента и пользу продукта.",
+                    "input": {
+                        "client_code": job.client_code,
+                        "name": job.client.get("name"),
+                        "behavior": job.behavior,
+                        "candidate_products": ["Карта для путешествий","Премиальная карта","Кредитная карта","Обмен валют","Кредит наличными","Депозит Мультивалютный","Депозит Сберегательный","Депозит Накопительный","Инвестиции","Золотые слитки"],
+                        "chosen_product": job.product
+                    },
+                    "output": push
+                }))
+            bar.update(len(jobs))
 
     print("Saved:", out_csv)
     print("Also: out/push_sft.jsonl and intermediate/benefits.jsonl")
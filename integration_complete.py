@@ -7,8 +7,8 @@ Shows how the Ollama + ML model interface works together
 
 import os
 import pandas as pd
-from model_interface import ModelInterface
-from data_loader import load_clients, load_client_tables
+from model_interface import get_interface
+from data_loader import load_clients, load_client_tables, get_client_tx, get_client_tr
 
 def create_complete_example():
     """Create a complete working example"""
@@ -16,7 +16,7 @@ def create_complete_example():
     print("=" * 50)
     
     # Initialize
-    interface = ModelInterface()
+    interface = get_interface()
     clients = load_clients("data/clients.csv")
     tables = load_client_tables()
     
@@ -27,8 +27,8 @@ def create_complete_example():
     
     for client_id in interesting_clients:
         client_row = clients[clients['client_code'] == client_id].iloc[0]
-        tx = tables.get(client_id, {}).get("tx", pd.DataFrame())
-        tr = tables.get(client_id, {}).get("tr", pd.DataFrame())
+        tx = get_client_tx(tables, client_id)
+        tr = get_client_tr(tables, client_id)
         
         # Generate recommendation (without Ollama for speed)
         result = interface.generate_push_notification(
@@ -5,16 +5,21 @@ Binds Ollama LLM with the trained ML classifier for product recommendation
 """
 
 import os
+import csv
 import json
+import functools
 import pickle
+import multiprocessing as mp
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 import pandas as pd
 import numpy as np
 from typing import Dict, List, Tuple, Optional, Any
 import warnings
 warnings.filterwarnings("ignore")
 
-from data_loader import load_clients, load_client_tables
-from scoring import compute_expected_benefits, rank_products
+from data_loader import load_clients, load_client_tables, concat_client_tables, get_client_tx, get_client_tr
+from scoring import compute_expected_benefits, rank_products, build_cat_sets, ScoringCfg
 from prompts import build_user_prompt, SYSTEM_PROMPT, month_of_last_full_period
 from ollama_client import generate_with_guardrails
 from validator import validate_push, autocorrect
@@ -50,6 +55,23 @@ class ModelInterface:
         with open(model_meta_path, 'r', encoding='utf-8') as f:
             self.model_meta = json.load(f)
         
+        # Per-run constants derived from config, built once instead of per client
+        cta = self.config["cta"]
+        self._cta_map = {
+            "Карта для путешествий": cta["travel"],
+            "Премиальная карта": cta["premium"],
+            "Кредитная карта": cta["credit"],
+            "Обмен валют": cta["fx"],
+            "Депозит Мультивалютный": cta["deposit"],
+            "Депозит Сберегательный": cta["deposit"],
+            "Депозит Накопительный": cta["deposit"],
+            "Инвестиции": cta["invest"],
+            "Золотые слитки": cta["gold"],
+        }
+        self._cat_sets = build_cat_sets(self.config)
+        self._scoring_cfg = ScoringCfg.from_rates(self.config["rates"])
+        self._hybrid_rule_share = (self.config.get("hybrid") or {}).get("rule_share_threshold")
+        
         # Available product classes
         self.product_classes = self.model_meta.get('classes', [
             "Депозит Мультивалютный",
@@ -75,10 +97,12 @@ class ModelInterface:
         print(f"  - Product classes: {len(self.product_classes)}")
     
     def _load_ml_model(self):
-        """Load the ML model with error handling"""
+        """Load the ML model with error handling (joblib copy next to the pickle is preferred)"""
         try:
-            with open(self.model_path, 'rb') as f:
-                self.ml_model = pickle.load(f)
+            self.ml_model = self._load_joblib_model()
+            if self.ml_model is None:
+                with open(self.model_path, 'rb') as f:
+                    self.ml_model = pickle.load(f)
             self.ml_model_available = True
             print(f"ML model loaded successfully: {type(self.ml_model)}")
         except Exception as e:
@@ -86,6 +110,24 @@ class ModelInterface:
             print("Will fall back to rule-based scoring")
             self.ml_model_available = False
     
+    def _load_joblib_model(self):
+        """
+        Load model/model.joblib (uncompressed joblib dump) with memory-mapped arrays
+        Returns None if joblib or the file is missing or cannot be loaded, so the caller falls back to pickle
+        """
+        joblib_path = os.path.splitext(self.model_path)[0] + '.joblib'
+        if not os.path.exists(joblib_path):
+            return None
+        try:
+            import joblib
+        except ImportError:
+            return None
+        try:
+            return joblib.load(joblib_path, mmap_mode='r')
+        except Exception as e:
+            print(f"Warning: Could not load {joblib_path}: {e}; trying {self.model_path}")
+            return None
+    
     def extract_features(self, client_row: pd.Series, tx: pd.DataFrame, tr: pd.DataFrame) -> np.ndarray:
         """
         Extract features for ML model prediction
@@ -96,6 +138,7 @@ class ModelInterface:
         # Client features
         age = int(client_row.get('age', 0)) if pd.notna(client_row.get('age')) else 0
         avg_balance = float(client_row.get('avg_monthly_balance_KZT', 0))
+        avg_balance = avg_balance if pd.notna(avg_balance) else 0.0
         
         features.extend([age, avg_balance])
         
@@ -112,7 +155,7 @@ class ModelInterface:
             avg_tx = total_spend / tx_count if tx_count > 0 else 0
             
             # Category spending
-            cat_spend = tx.groupby('category')['amount'].sum().to_dict()
+            cat_spend = tx.groupby('category', observed=True)['amount'].sum().to_dict()
             travel_spend = sum(cat_spend.get(c, 0) for c in ['Путешествия', 'Такси', 'Отели'])
             restaurant_spend = cat_spend.get('Кафе и рестораны', 0)
             online_spend = sum(cat_spend.get(c, 0) for c in ['Смотрим дома', 'Играем дома', 'Едим дома'])
@@ -133,10 +176,79 @@ class ModelInterface:
         
         return np.array(features).reshape(1, -1)
     
-    def predict_product_ml(self, client_row: pd.Series, tx: pd.DataFrame, tr: pd.DataFrame) -> List[Tuple[str, float]]:
+    def extract_features_batch(self, clients_df: pd.DataFrame, tx_all: pd.DataFrame, tr_all: pd.DataFrame) -> np.ndarray:
+        """
+        Extract ML features for all clients with one groupby per table
+        Same column layout as extract_features; rows follow the order of clients_df
+        """
+        codes = clients_df['client_code'].astype('int64')
+        n = len(clients_df)
+        
+        # Client features
+        age = clients_df['age'].fillna(0).astype(int).to_numpy() if 'age' in clients_df.columns else np.zeros(n)
+        avg_balance = (clients_df['avg_monthly_balance_KZT'].astype(float).fillna(0).to_numpy()
+                       if 'avg_monthly_balance_KZT' in clients_df.columns else np.zeros(n))
+        statuses = ['Студент', 'Зарплатный клиент', 'Премиальный клиент', 'Стандартный клиент']
+        status = clients_df['status'].to_numpy() if 'status' in clients_df.columns else np.full(n, 'Стандартный клиент')
+        status_features = (status[:, None] == np.array(statuses, dtype=object)).astype(int)
+        
+        # Transaction features: clients x categories pivot, then plain column sums
+        tx_cols = ['total_spend', 'tx_count', 'avg_tx', 'travel_spend', 'restaurant_spend', 'online_spend']
+        if tx_all is not None and not tx_all.empty:
+            pivot = tx_all.groupby(['client_code', 'category'], observed=True)['amount'].sum().unstack(fill_value=0)
+            pivot.columns = pivot.columns.astype(object)
+            
+            def spend(cats):
+                return pivot.reindex(columns=cats, fill_value=0).sum(axis=1)
+            
+            tx_codes = tx_all['client_code'].to_numpy()
+            starts = np.flatnonzero(np.r_[True, tx_codes[1:] != tx_codes[:-1]])
+            # len(pivot) <= distinct clients <= runs of equal codes, so equality means each client's rows
+            # form one contiguous block, in any client order (as concat_client_tables produces from both
+            # the cache and the CSVs): totals are then segment sums, no groupby needed
+            if len(starts) == len(pivot):
+                amounts = np.nan_to_num(tx_all['amount'].to_numpy(dtype=float))
+                total_sum = pd.Series(np.add.reduceat(amounts, starts), index=tx_codes[starts])
+                total_size = pd.Series(np.diff(np.append(starts, len(tx_codes))), index=tx_codes[starts])
+            else:
+                totals = tx_all.groupby('client_code')['amount'].agg(['sum', 'size'])
+                total_sum, total_size = totals['sum'], totals['size']
+            tx_feats = pd.DataFrame({
+                'total_spend': total_sum,
+                'tx_count': total_size,
+                'avg_tx': total_sum / total_size,
+                'travel_spend': spend(['Путешествия', 'Такси', 'Отели']),
+                'restaurant_spend': spend(['Кафе и рестораны']),
+                'online_spend': spend(['Смотрим дома', 'Играем дома', 'Едим дома']),
+            })
+            tx_feats = tx_feats.reindex(codes, fill_value=0).to_numpy(dtype=float)
+        else:
+            tx_feats = np.zeros((n, len(tx_cols)))
+        
+        # Transfer features
+        if tr_all is not None and not tr_all.empty:
+            type_counts = tr_all.groupby(['client_code', 'type'], observed=True).size().unstack(fill_value=0)
+            type_counts.columns = type_counts.columns.astype(object)
+            tr_feats = pd.DataFrame({
+                name: type_counts.reindex(columns=types, fill_value=0).sum(axis=1)
+                for name, types in [('fx_count', ['fx_buy', 'fx_sell']),
+                                    ('invest_count', ['invest_in', 'invest_out']),
+                                    ('gold_count', ['gold_buy_out', 'gold_sell_in'])]
+            })
+            tr_feats = tr_feats.reindex(codes, fill_value=0).to_numpy(dtype=float)
+        else:
+            tr_feats = np.zeros((n, 3))
+        
+        return np.column_stack([age, avg_balance, status_features, tx_feats, tr_feats]).astype(float)
+    
+    def predict_product_ml(self, client_row: pd.Series, tx: pd.DataFrame, tr: pd.DataFrame,
+                           features: Optional[np.ndarray] = None) -> List[Tuple[str, float]]:
         """
         Predict product recommendations using ML model
         
+        Args:
+            features: Precomputed feature row (from extract_features_batch); extracted from tx/tr if omitted
+        
         Returns:
             List of (product_name, probability) tuples sorted by probability
         """
@@ -144,40 +256,111 @@ class ModelInterface:
             return []
         
         try:
-            features = self.extract_features(client_row, tx, tr)
-            
-            if hasattr(self.ml_model, 'predict_proba'):
-                probabilities = self.ml_model.predict_proba(features)[0]
-                predictions = list(zip(self.product_classes, probabilities))
-                predictions.sort(key=lambda x: x[1], reverse=True)
-                return predictions
-            elif hasattr(self.ml_model, 'decision_function'):
-                scores = self.ml_model.decision_function(features)[0]
-                predictions = list(zip(self.product_classes, scores))
-                predictions.sort(key=lambda x: x[1], reverse=True)
-                return predictions
-            else:
+            if features is None:
+                features = self.extract_features(client_row, tx, tr)
+            X = np.asarray(features, dtype=float).reshape(1, -1)
+        except Exception as e:
+            print(f"ML prediction failed: {e}")
+            return []
+        return self.predict_product_ml_batch(X)[0]
+    
+    def predict_top_product_ml(self, client_row: pd.Series, tx: pd.DataFrame, tr: pd.DataFrame,
+                               features: Optional[np.ndarray] = None) -> Optional[Tuple[str, float]]:
+        """
+        Top ML product only (argmax, no ranking of all classes)
+        
+        Returns:
+            (product_name, probability), or None if the model is unavailable or fails
+        """
+        if not self.ml_model_available:
+            return None
+        
+        try:
+            if features is None:
+                features = self.extract_features(client_row, tx, tr)
+            X = np.asarray(features, dtype=float).reshape(1, -1)
+        except Exception as e:
+            print(f"ML prediction failed: {e}")
+            return None
+        return self.predict_top_product_ml_batch(X)[0]
+    
+    def _ml_scores(self, X: np.ndarray) -> Optional[np.ndarray]:
+        """(N, C) class scores from predict_proba or decision_function; None if the model only predicts labels"""
+        if hasattr(self.ml_model, 'predict_proba'):
+            return np.asarray(self.ml_model.predict_proba(X))
+        if hasattr(self.ml_model, 'decision_function'):
+            return np.asarray(self.ml_model.decision_function(X))
+        return None
+    
+    def predict_product_ml_batch(self, X: np.ndarray) -> List[List[Tuple[str, float]]]:
+        """
+        Predict product recommendations for a whole (N, D) feature matrix in one model call
+        
+        Returns:
+            Per row, list of (product_name, probability) tuples sorted by probability
+        """
+        if not self.ml_model_available:
+            return [[] for _ in range(len(X))]
+        
+        try:
+            scores = self._ml_scores(X)
+            if scores is None:
                 # Just predict class
-                pred_class = self.ml_model.predict(features)[0]
-                return [(pred_class, 1.0)]
+                return [[(pred_class, 1.0)] for pred_class in self.ml_model.predict(X)]
+            
+            # Stable descending order, same tie handling as list.sort(reverse=True)
+            order = np.argsort(-scores, axis=1, kind='stable')
+            classes = self.product_classes
+            return [[(classes[j], float(row[j])) for j in idx] for row, idx in zip(scores, order)]
                 
         except Exception as e:
             print(f"ML prediction failed: {e}")
-            return []
+            return [[] for _ in range(len(X))]
+    
+    def predict_top_product_ml_batch(self, X: np.ndarray) -> List[Optional[Tuple[str, float]]]:
+        """
+        Top ML product per row of an (N, D) feature matrix
+        
+        Returns:
+            Per row, (product_name, probability), or None if prediction failed
+        """
+        if not self.ml_model_available:
+            return [None] * len(X)
+        
+        try:
+            scores = self._ml_scores(X)
+            if scores is None:
+                return [(pred_class, 1.0) for pred_class in self.ml_model.predict(X)]
+            
+            # argmax returns the first maximum, the same class a stable descending sort puts first
+            best = scores.argmax(axis=1)
+            classes = self.product_classes
+            return [(classes[j], float(row[j])) for row, j in zip(scores, best)]
+                
+        except Exception as e:
+            print(f"ML prediction failed: {e}")
+            return [None] * len(X)
     
-    def predict_product_rules(self, client_row: pd.Series, tx: pd.DataFrame, tr: pd.DataFrame) -> List[Tuple[str, float]]:
+    def predict_product_rules(self, client_row: pd.Series, tx: pd.DataFrame, tr: pd.DataFrame,
+                              benefits: Optional[Dict[str, float]] = None) -> List[Tuple[str, float]]:
         """
         Predict product recommendations using rule-based scoring
         
+        Args:
+            benefits: Precomputed compute_expected_benefits output for this client; computed if omitted
+        
         Returns:
             List of (product_name, benefit_score) tuples sorted by benefit
         """
-        benefits, _ = compute_expected_benefits(client_row, tx, tr, self.config)
+        if benefits is None:
+            benefits, _ = compute_expected_benefits(client_row, tx, tr, self.config, self._cat_sets, self._scoring_cfg)
         ranked = rank_products(benefits)
         return ranked
     
     def get_best_product(self, client_row: pd.Series, tx: pd.DataFrame, tr: pd.DataFrame, 
-                        method: str = "hybrid") -> Tuple[str, float]:
+                        method: str = "hybrid",
+                        ml_top: Optional[Tuple[str, float]] = None,
+                        benefits: Optional[Dict[str, float]] = None) -> Tuple[str, float]:
         """
         Get the best product recommendation
         
@@ -186,29 +369,60 @@ class ModelInterface:
             tx: Transaction data
             tr: Transfer data  
             method: "ml", "rules", or "hybrid"
+            ml_top: Optional precomputed output of predict_top_product_ml for this client
+            benefits: Optional precomputed rule-based benefits for this client
             
         Returns:
             (product_name, confidence_score)
         """
-        if method == "ml" and self.ml_model_available:
-            ml_predictions = self.predict_product_ml(client_row, tx, tr)
-            if ml_predictions:
-                return ml_predictions[0]
+        if method == "rules" or not self.ml_model_available:
+            # Rules only: the ML model is never touched
+            rule_ranked = self.predict_product_rules(client_row, tx, tr, benefits)
+            return self._combine_with_ml(rule_ranked, None, "rules")
+        
+        if method == "ml":
+            # ML only: rules are scored just when the model fails for this client
+            if ml_top is None:
+                ml_top = self.predict_top_product_ml(client_row, tx, tr)
+            if ml_top:
+                return ml_top
+            rule_ranked = self.predict_product_rules(client_row, tx, tr, benefits)
+            return self._combine_with_ml(rule_ranked, None, "rules")
+        
+        if method == "hybrid":
+            # Rules first (cheap); ML only when they are not decisive enough
+            rule_ranked = self.predict_product_rules(client_row, tx, tr, benefits)
+            if ml_top is None and not self._rules_decisive(rule_ranked):
+                ml_top = self.predict_top_product_ml(client_row, tx, tr)
+            return self._combine_with_ml(rule_ranked, ml_top, "hybrid")
         
+        # Fallback
+        return ("Инвестиции", 0.1)
+    
+    def _rules_decisive(self, rule_ranked: List[Tuple[str, float]]) -> bool:
+        """
+        True if the top rule product's share of all positive benefits reaches hybrid.rule_share_threshold
+        Without the threshold in config, hybrid always consults the ML model
+        """
+        if self._hybrid_rule_share is None or not rule_ranked:
+            return False
+        total = sum(b for _, b in rule_ranked if b > 0)
+        return total > 0 and rule_ranked[0][1] / total >= self._hybrid_rule_share
+    
+    def _combine_with_ml(self, rule_ranked: Optional[List[Tuple[str, float]]],
+                         ml_top: Optional[Tuple[str, float]], method: str) -> Tuple[str, float]:
+        """Choose the product for "rules" or "hybrid" from an already computed rule ranking and ML top"""
         if method == "rules" or not self.ml_model_available:
-            rule_predictions = self.predict_product_rules(client_row, tx, tr)
-            if rule_predictions:
-                return rule_predictions[0]
+            if rule_ranked:
+                return rule_ranked[0]
         
         if method == "hybrid":
             # Combine ML and rule-based approaches
-            ml_predictions = self.predict_product_ml(client_row, tx, tr) if self.ml_model_available else []
-            rule_predictions = self.predict_product_rules(client_row, tx, tr)
+            ml_top = ml_top if self.ml_model_available else None
             
-            if ml_predictions and rule_predictions:
+            if ml_top and rule_ranked:
                 # Weight ML predictions higher if available
-                ml_top = ml_predictions[0]
-                rule_top = rule_predictions[0]
+                rule_top = rule_ranked[0]
                 
                 # If top predictions agree, return with high confidence
                 if ml_top[0] == rule_top[0]:
@@ -216,8 +430,8 @@ class ModelInterface:
                 else:
                     # Return ML prediction but with lower confidence
                     return (ml_top[0], ml_top[1] * 0.8)
-            elif rule_predictions:
-                return rule_predictions[0]
+            elif rule_ranked:
+                return rule_ranked[0]
         
         # Fallback
         return ("Инвестиции", 0.1)
@@ -227,7 +441,8 @@ class ModelInterface:
                                  tx: pd.DataFrame, 
                                  tr: pd.DataFrame,
                                  ollama_model: str = None,
-                                 prediction_method: str = "hybrid") -> Dict[str, Any]:
+                                 prediction_method: str = "hybrid",
+                                 ml_top: Optional[Tuple[str, float]] = None) -> Dict[str, Any]:
         """
         Generate personalized push notification
         
@@ -237,32 +452,22 @@ class ModelInterface:
             tr: Transfer data
             ollama_model: Ollama model name (e.g., "mistral:7b")
             prediction_method: "ml", "rules", or "hybrid"
+            ml_top: Optional precomputed output of predict_top_product_ml for this client
             
         Returns:
             Dictionary with recommendation results
         """
         client_code = int(client_row['client_code'])
         
-        # Get product recommendation
-        best_product, confidence = self.get_best_product(client_row, tx, tr, prediction_method)
+        # Rule-based benefits are computed once and shared with product selection
+        benefits, facts = compute_expected_benefits(client_row, tx, tr, self.config, self._cat_sets, self._scoring_cfg)
         
-        # Calculate expected benefit using rule-based scoring
-        benefits, facts = compute_expected_benefits(client_row, tx, tr, self.config)
+        # Get product recommendation
+        best_product, confidence = self.get_best_product(client_row, tx, tr, prediction_method, ml_top, benefits)
         expected_benefit = benefits.get(best_product, 0.0)
         
         # Get CTA for the product
-        cta_map = {
-            "Карта для путешествий": self.config["cta"]["travel"],
-            "Премиальная карта": self.config["cta"]["premium"],
-            "Кредитная карта": self.config["cta"]["credit"],
-            "Обмен валют": self.config["cta"]["fx"],
-            "Депозит Мультивалютный": self.config["cta"]["deposit"],
-            "Депозит Сберегательный": self.config["cta"]["deposit"],
-            "Депозит Накопительный": self.config["cta"]["deposit"],
-            "Инвестиции": self.config["cta"]["invest"],
-            "Золотые слитки": self.config["cta"]["gold"],
-        }
-        cta = cta_map.get(best_product, "Посмотреть")
+        cta = self._cta_map.get(best_product, "Посмотреть")
         
         # Build behavior summary
         behavior = self._build_behavior_summary(tx)
@@ -316,16 +521,18 @@ class ModelInterface:
         if tx is None or tx.empty:
             return {"top_categories": [], "taxi_count": 0, "travel_sum": 0.0}
         
-        cat_spend = tx.groupby("category")["amount"].sum().sort_values(ascending=False).to_dict()
-        top3 = list(cat_spend)[:3]
+        # One groupby serves top-3 (nlargest, no full sort) and the travel sum
+        cat_spend = tx.groupby("category", observed=True)["amount"].sum()
+        cat_spend.index = cat_spend.index.astype(object)
+        top3 = cat_spend.nlargest(3).index.tolist()
         taxi_count = int((tx["category"] == "Такси").sum()) if "category" in tx.columns else 0
-        travel_sum = float(tx.loc[tx["category"].isin(["Путешествия","Такси","Отели"]), "amount"].sum())
+        travel_sum = float(cat_spend.reindex(["Путешествия", "Такси", "Отели"], fill_value=0).sum())
         
         return {
             "top_categories": top3, 
             "taxi_count": taxi_count, 
             "travel_sum": travel_sum,
-            "category_spending": cat_spend
+            "category_spending": cat_spend.to_dict()
         }
     
     def _generate_template_push(self, client_row: pd.Series, behavior: Dict, 
@@ -358,7 +565,9 @@ class ModelInterface:
                            clients_csv: str = "data/clients.csv",
                            ollama_model: str = None,
                            prediction_method: str = "hybrid",
-                           output_path: str = "out/push_recommendations_interface.csv") -> pd.DataFrame:
+                           output_path: str = "out/push_recommendations_interface.csv",
+                           workers: int = 4,
+                           jobs: int = 1) -> pd.DataFrame:
         """
         Process all clients and generate recommendations
         
@@ -367,6 +576,8 @@ class ModelInterface:
             ollama_model: Ollama model name (optional)
             prediction_method: "ml", "rules", or "hybrid"
             output_path: Output CSV path
+            workers: Parallel Ollama requests (threads; used only with ollama_model)
+            jobs: Worker processes for generation without Ollama (1 = in-process)
             
         Returns:
             DataFrame with all results
@@ -377,49 +588,97 @@ class ModelInterface:
         clients = load_clients(clients_csv)
         tables = load_client_tables()
         
-        results = []
+        # ML features and predictions for all clients up front: one groupby and one predict_proba call
+        ml_tops = None
+        if self.ml_model_available and prediction_method != "rules":
+            try:
+                X = self.extract_features_batch(clients, concat_client_tables(tables, "tx"), concat_client_tables(tables, "tr"))
+                ml_tops = self.predict_top_product_ml_batch(X)
+            except Exception as e:
+                # Same degradation as the per-client path: no precomputed ML, each client falls back on its own
+                print(f"Batch ML prediction failed: {e}")
+                ml_tops = None
         
         print(f"Processing {len(clients)} clients...")
         
-        for _, client_row in tqdm(clients.iterrows(), total=len(clients)):
+        tasks = []
+        for i, (_, client_row) in enumerate(clients.iterrows()):
             client_code = int(client_row['client_code'])
-            
-            # Get client data
-            tx = tables.get(client_code, {}).get("tx", pd.DataFrame())
-            tr = tables.get(client_code, {}).get("tr", pd.DataFrame())
-            
-            # Generate recommendation
-            result = self.generate_push_notification(
-                client_row, tx, tr, ollama_model, prediction_method
+            tasks.append((
+                client_row,
+                get_client_tx(tables, client_code),
+                get_client_tr(tables, client_code),
+                ml_tops[i] if ml_tops is not None else None
+            ))
+        
+        def _gen_one(task):
+            client_row, tx, tr, ml_top = task
+            return self.generate_push_notification(
+                client_row, tx, tr, ollama_model, prediction_method, ml_top=ml_top
             )
-            
-            results.append(result)
-        
-        # Create output DataFrame
-        output_df = pd.DataFrame([
-            {
-                'client_code': r['client_code'],
-                'product': r['product'],
-                'push_notification': r['push_notification']
-            }
-            for r in results
-        ])
-        
-        # Save results
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        output_df.to_csv(output_path, index=False, encoding='utf-8')
         
-        # Save detailed results
-        detailed_path = output_path.replace('.csv', '_detailed.json')
-        with open(detailed_path, 'w', encoding='utf-8') as f:
-            json.dump(results, f, ensure_ascii=False, indent=2, default=str)
+        # Results are written as they arrive: CSV rows plus one JSON line per client for the details
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        detailed_path = output_path.replace('.csv', '_detailed.jsonl')
+        rows = []
+        with open(output_path, 'w', encoding='utf-8', newline='') as fcsv, \
+             open(detailed_path, 'w', encoding='utf-8') as fdet:
+            writer = csv.DictWriter(fcsv, fieldnames=['client_code', 'product', 'push_notification'], lineterminator='\n')
+            writer.writeheader()
+            
+            if ollama_model:
+                # Ollama calls are mostly waiting on the server, so threads overlap them; map keeps client order
+                executor = ThreadPoolExecutor(max_workers=max(workers, 1))
+                generated = executor.map(_gen_one, tasks)
+            elif jobs > 1:
+                # Without Ollama the loop is CPU-bound pandas/scoring work, which threads can't spread past the GIL;
+                # pickling self and the tables to each worker only pays off on large client sets, hence opt-in.
+                # imap (not imap_unordered) keeps the CSV in client order
+                executor = mp.Pool(jobs, initializer=_init_worker, initargs=(self, prediction_method))
+                generated = executor.imap(_generate_in_worker, tasks, chunksize=max(1, min(64, len(tasks) // (jobs * 4))))
+            else:
+                executor = nullcontext()
+                generated = map(_gen_one, tasks)
+            with executor:
+                for r in tqdm(generated, total=len(tasks)):
+                    row = {
+                        'client_code': r['client_code'],
+                        'product': r['product'],
+                        'push_notification': r['push_notification']
+                    }
+                    writer.writerow(row)
+                    fdet.write(json.dumps(r, ensure_ascii=False, default=str) + '\n')
+                    rows.append(row)
         
         print(f"Results saved to: {output_path}")
         print(f"Detailed results saved to: {detailed_path}")
         
+        output_df = pd.DataFrame(rows, columns=['client_code', 'product', 'push_notification'])
         return output_df
 
 
+# Process-pool workers for process_all_clients: the interface is handed over once per worker
+_worker_interface = None
+_worker_method = None
+
+def _init_worker(interface: ModelInterface, prediction_method: str) -> None:
+    global _worker_interface, _worker_method
+    _worker_interface = interface
+    _worker_method = prediction_method
+
+def _generate_in_worker(task) -> Dict[str, Any]:
+    client_row, tx, tr, ml_top = task
+    return _worker_interface.generate_push_notification(
+        client_row, tx, tr, None, _worker_method, ml_top=ml_top
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def get_interface() -> ModelInterface:
+    """Shared ModelInterface instance, so config and the ML model are loaded once per process"""
+    return ModelInterface()
+
+
 def main():
     """CLI interface for the model"""
     import argparse
@@ -432,11 +691,13 @@ def main():
     parser.add_argument("--output", default="out/push_recommendations_interface.csv",
                        help="Output CSV path")
     parser.add_argument("--client-id", type=int, help="Process single client by ID")
+    parser.add_argument("--workers", type=int, default=4, help="Parallel Ollama requests when processing all clients")
+    parser.add_argument("--jobs", type=int, default=1, help="Worker processes without Ollama (1 = in-process)")
     
     args = parser.parse_args()
     
     # Initialize interface
-    interface = ModelInterface()
+    interface = get_interface()
     
     if args.client_id:
         # Process single client
@@ -444,8 +705,8 @@ def main():
         client_row = clients[clients['client_code'] == args.client_id].iloc[0]
         
         tables = load_client_tables()
-        tx = tables.get(args.client_id, {}).get("tx", pd.DataFrame())
-        tr = tables.get(args.client_id, {}).get("tr", pd.DataFrame())
+        tx = get_client_tx(tables, args.client_id)
+        tr = get_client_tr(tables, args.client_id)
         
         result = interface.generate_push_notification(
             client_row, tx, tr, args.ollama_model, args.method
@@ -460,7 +721,7 @@ def main():
     else:
         # Process all clients
         results_df = interface.process_all_clients(
-            args.clients_csv, args.ollama_model, args.method, args.output
+            args.clients_csv, args.ollama_model, args.method, args.output, args.workers, args.jobs
         )
         
         print(f"\nProcessed {len(results_df)} clients")
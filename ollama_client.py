@@ -1,12 +1,85 @@
 # -*- coding: utf-8 -*-
-import subprocess
+import http.client, json, os, subprocess, threading
+from urllib.parse import urlsplit
 from validator import validate_push, autocorrect
 
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "127.0.0.1:11434")
+
+_local = threading.local()
+_http_unavailable = False
+_cli_unavailable = False
+
+def _connection(timeout_sec: int) -> http.client.HTTPConnection:
+    # одно keep-alive соединение на поток: генерация идёт из ThreadPoolExecutor
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        url = urlsplit(OLLAMA_HOST if "://" in OLLAMA_HOST else "http://" + OLLAMA_HOST)
+        conn = http.client.HTTPConnection(url.hostname or "127.0.0.1", url.port or 11434, timeout=timeout_sec)
+        _local.conn = conn
+    return conn
+
+class _ConnectFailed(OSError):
+    """Не удалось подключиться к серверу Ollama (сервер не запущен / адрес недоступен)."""
+
+def _run_ollama_http(model: str, prompt: str, timeout_sec: int) -> str:
+    """POST /api/generate без стриминга, через переиспользуемое соединение."""
+    body = json.dumps({"model": model, "prompt": prompt, "stream": False}).encode("utf-8")
+    for attempt in range(2):
+        conn = _connection(timeout_sec)
+        reused = conn.sock is not None
+        if not reused:
+            # подключаемся явно, чтобы отличать «сервера нет» от ошибок отдельного запроса
+            try:
+                conn.connect()
+            except OSError as e:
+                conn.close()
+                _local.conn = None
+                raise _ConnectFailed(str(e)) from e
+        try:
+            conn.request("POST", "/api/generate", body, {"Content-Type": "application/json"})
+            resp = conn.getresponse()
+            data = resp.read()
+            break
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            # сервер закрыл простаивавшее keep-alive соединение — пробуем ещё раз на новом
+            conn.close()
+            _local.conn = None
+            if not reused or attempt:
+                raise
+        except Exception:
+            conn.close()
+            _local.conn = None
+            raise
+    if resp.status != 200:
+        raise http.client.HTTPException(f"Ollama HTTP {resp.status}")
+    return json.loads(data).get("response", "")
+
 def run_ollama(model: str, prompt: str, timeout_sec: int = 120) -> str:
+    """
+    Вызов Ollama через REST API (POST /api/generate) с keep-alive.
+    Если к серверу не подключиться — один раз переключаемся на `ollama run` и дальше идём через CLI.
+    Ошибки отдельного запроса (статус не 200, битый JSON, таймаут) дают "" только для этого вызова.
+    """
+    global _http_unavailable
+    if _http_unavailable and _cli_unavailable:
+        # Ollama нет ни по HTTP, ни в PATH — сразу пусто, вызывающий уйдёт в шаблон
+        return ""
+    if not _http_unavailable:
+        try:
+            return (_run_ollama_http(model, prompt, timeout_sec) or "").strip()
+        except _ConnectFailed:
+            _http_unavailable = True
+        except (OSError, http.client.HTTPException, ValueError):
+            # временный сбой (503, обрыв, таймаут): HTTP остаётся включённым для следующих вызовов
+            return ""
+    return _run_ollama_cli(model, prompt, timeout_sec)
+
+def _run_ollama_cli(model: str, prompt: str, timeout_sec: int = 120) -> str:
     """
     Кросс-платформенный вызов Ollama:
     - Пишем prompt в stdin в UTF-8, чтобы не падать на символе ₸ в Windows (cp1251).
     """
+    global _cli_unavailable
     try:
         proc = subprocess.Popen(
             ["ollama", "run", model],
@@ -18,6 +91,10 @@ def run_ollama(model: str, prompt: str, timeout_sec: int = 120) -> str:
             errors="replace"    # на всякий случай
         )
         out, err = proc.communicate(prompt, timeout=timeout_sec)
+    except FileNotFoundError:
+        # ollama не установлен — больше не пытаемся запускать
+        _cli_unavailable = True
+        return ""
     except subprocess.TimeoutExpired:
         try:
             proc.kill()
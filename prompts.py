@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
+import functools, math
 from datetime import datetime
+import numpy as np
 import pandas as pd
 
 RU_MONTHS_GEN = {
@@ -9,7 +11,14 @@ RU_MONTHS_GEN = {
 
 def format_kzt(amount: float) -> str:
     amount = 0 if pd.isna(amount) else float(amount)
-    s = f"{amount:,.0f}".replace(",", "X").replace(".", ",").replace("X", " ")
+    if not math.isfinite(amount):
+        return f"{amount} ₸"
+    # округляем до тенге так же, как :.0f, и кешируем уже по целому
+    return _format_kzt_int(round(amount))
+
+@functools.lru_cache(maxsize=4096)
+def _format_kzt_int(amount: int) -> str:
+    s = f"{amount:,}".replace(",", " ")
     return f"{s} ₸"
 
 def month_of_last_full_period(dates: pd.Series) -> int:
@@ -17,18 +26,53 @@ def month_of_last_full_period(dates: pd.Series) -> int:
         dt = datetime.now()
         m = dt.month - 1 or 12
         return m
-    months = pd.to_datetime(dates, errors="coerce").dt.month.dropna().astype(int)
-    if months.empty:
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, errors="coerce")
+    months = dates.dt.month.dropna().to_numpy(dtype=np.int64)
+    if months.size == 0:
         dt = datetime.now()
         m = dt.month - 1 or 12
         return m
-    return int(months.mode().iloc[0])
+    # самый частый месяц; при равенстве argmax берёт меньший — как mode().iloc[0]
+    return int(np.bincount(months, minlength=13)[1:].argmax() + 1)
+
+# то же, что month_of_last_full_period, но сразу для всех клиентов: client_code -> месяц;
+# клиентов без разбираемых дат в результате нет — для них берётся значение по умолчанию
+def month_of_last_full_period_by_client(all_tx: pd.DataFrame) -> dict:
+    if all_tx is None or all_tx.empty or "date" not in all_tx.columns:
+        return {}
+    dates = all_tx["date"]
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, errors="coerce", cache=True)
+    valid = dates.notna().to_numpy()
+    months = dates.dt.month.to_numpy()[valid].astype(np.int64)
+    codes = all_tx["client_code"].to_numpy()[valid].astype(np.int64)
+    # целый ключ (клиент, месяц) вместо groupby по паре колонок с float-месяцем
+    keys, counts = np.unique(codes * 13 + months, return_counts=True)
+    cids, ms = keys // 13, keys % 13
+    # клиент, затем частота по убыванию, затем меньший месяц — как mode().iloc[0]
+    order = np.lexsort((ms, -counts, cids))
+    first_cids, first = np.unique(cids[order], return_index=True)
+    return dict(zip(first_cids.tolist(), ms[order][first].tolist()))
 
 SYSTEM_PROMPT = """Вы — редактор банка. Пишите короткие пуш-уведомления (180–220 символов), на «вы», без капса, максимум 1 «!».
 Без воды и давления; одна мысль и один CTA из списка: «Открыть», «Настроить», «Посмотреть», «Оформить сейчас», «Оформить карту», «Открыть вклад», «Открыть счёт».
 Форматируйте валюту так: 27 400 ₸. Допустим 0–1 эмодзи по смыслу.
 """
 
+# шаблон разбирается один раз на модуль, в функции — только format_map
+_USER_PROMPT_TEMPLATE = """Дано:
+- Клиент: {name}, статус: {status}, возраст: {age}, город: {city}, средний остаток: {ab}
+- Поведение за 3 мес: топ категории — {top_categories}; такси: {taxi_count}; траты на поездки: {travel_sum_fmt}
+- Выбранный продукт: {product}
+- Ожидаемая выгода: {benefit}
+- Месяц: {month_name}
+- CTA: {cta}
+
+Задача:
+Сгенерируйте 1 пуш-сообщение: персональный контекст → польза продукта → CTA. 180–220 символов, обращение на «вы», без капса.
+"""
+
 def build_user_prompt(name: str,
                       status: str,
                       age: int,
@@ -45,15 +89,8 @@ def build_user_prompt(name: str,
     taxi_count = behavior.get("taxi_count", 0)
     travel_sum = behavior.get("travel_sum", 0.0)
     travel_sum_fmt = format_kzt(travel_sum) if travel_sum else "0 ₸"
-    ab = format_kzt(avg_balance)
-    return f"""Дано:
-- Клиент: {name}, статус: {status}, возраст: {age}, город: {city}, средний остаток: {ab}
-- Поведение за 3 мес: топ категории — {top_categories}; такси: {taxi_count}; траты на поездки: {travel_sum_fmt}
-- Выбранный продукт: {product}
-- Ожидаемая выгода: {benefit}
-- Месяц: {month_name}
-- CTA: {cta}
-
-Задача:
-Сгенерируйте 1 пуш-сообщение: персональный контекст → польза продукта → CTA. 180–220 символов, обращение на «вы», без капса.
-"""
+    return _USER_PROMPT_TEMPLATE.format_map({
+        "name": name, "status": status, "age": age, "city": city, "ab": format_kzt(avg_balance),
+        "top_categories": top_categories, "taxi_count": taxi_count, "travel_sum_fmt": travel_sum_fmt,
+        "product": product, "benefit": benefit, "month_name": month_name, "cta": cta,
+    })
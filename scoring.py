@@ -1,65 +1,138 @@
 # -*- coding: utf-8 -*-
 import yaml, pandas as pd
-from typing import Dict, Tuple, List
+from dataclasses import dataclass
+from typing import Dict, Tuple, List, Optional
+
+try:
+    from numba import njit
+except ImportError:  # numba опционален, без него ядро остаётся обычной функцией
+    def njit(**kwargs):
+        return lambda f: f
+
+FX_TYPES = frozenset(["fx_buy", "fx_sell"])
+FX_OPS_TYPES = ("fx_buy", "fx_sell", "deposit_fx_topup_out", "deposit_fx_withdraw_in")
+INVEST_TYPES = ("invest_in", "invest_out")
+GOLD_TYPES = ("gold_buy_out", "gold_sell_in")
+# пороги среднего остатка для base_default / base_mid / base_high
+PREMIUM_TIERS = (1_000_000, 6_000_000)
+
+def build_cat_sets(cfg: dict) -> Dict[str, frozenset]:
+    # корзины категорий из конфига; собираем один раз и передаём в compute_expected_benefits
+    return {k: frozenset(v) for k, v in cfg["categories"].items()}
+
+def _bucket_spend(cat_spend: pd.Series, categories) -> float:
+    # сумма трат по корзине категорий одной операцией, без поштучных .get;
+    # sorted — порядок обхода frozenset зависит от хэш-сида, а с ним и последний бит суммы
+    return float(cat_spend.reindex(sorted(categories), fill_value=0).to_numpy().sum())
+
+@dataclass(frozen=True, slots=True)
+class ScoringCfg:
+    """Ставки из cfg["rates"] плоскими полями: собираются один раз, без вложенных dict-обращений на клиента."""
+    travel_cashback: float
+    premium_base_default: float
+    premium_base_mid: float
+    premium_base_high: float
+    premium_boosted_rate: float
+    premium_cashback_cap: float
+    credit_fav_rate: float
+    fx_saving_rate: float
+    dep_multi: float
+    dep_save: float
+    dep_accum: float
+
+    @classmethod
+    def from_rates(cls, rates: dict) -> "ScoringCfg":
+        p, d = rates["premium"], rates["deposits"]
+        return cls(*(float(x) for x in (
+            rates["travel_cashback"], p["base_default"], p["base_mid"], p["base_high"],
+            p["boosted_categories_rate"], p["cashback_cap_month"], rates["credit_card"]["fav_rate"],
+            rates["fx_saving_rate"], d["multi"], d["save"], d["accum"],
+        )))
+
+    def as_tuple(self) -> Tuple[float, ...]:
+        # порядок полей = порядок индексов r[...] в _score_kernel
+        return (self.travel_cashback, self.premium_base_default, self.premium_base_mid, self.premium_base_high,
+                self.premium_boosted_rate, self.premium_cashback_cap, self.credit_fav_rate,
+                self.fx_saving_rate, self.dep_multi, self.dep_save, self.dep_accum)
+
+@njit(cache=True)
+def _score_kernel(travel_spend, boosted_spend, total_spend, fav_spend, fx_vol, avg_bal, r):
+    """Числовое ядро скоринга: суммы трат и остаток -> выгоды по продуктам."""
+    travel_cb = r[0] * travel_spend
+
+    # ступень премиальной ставки без ветвлений: число пройденных порогов, как searchsorted(side="right")
+    tier = int(avg_bal >= PREMIUM_TIERS[0]) + int(avg_bal >= PREMIUM_TIERS[1])
+    base = (r[1], r[2], r[3])[tier]
+    boosted_cb = r[4] * boosted_spend
+    other_cb = base * max(total_spend - boosted_spend, 0.0)
+    premium_cb = min(boosted_cb + other_cb, r[5])
+
+    cc_cb = r[6] * fav_spend
+    fx_saving = r[7] * fx_vol
+
+    # deposits (на 3 месяца)
+    dep_multi = r[8] * avg_bal / 12.0 * 3
+    dep_save = r[9] * avg_bal / 12.0 * 3
+    dep_acc = r[10] * avg_bal / 12.0 * 3
+    return travel_cb, premium_cb, base, cc_cb, fx_saving, dep_multi, dep_save, dep_acc
 
 def compute_expected_benefits(client_row: pd.Series,
                               tx: pd.DataFrame,
                               tr: pd.DataFrame,
-                              cfg: dict) -> Tuple[Dict[str, float], Dict[str, dict]]:
-    rates = cfg["rates"]
-    cats = cfg["categories"]
+                              cfg: dict,
+                              cat_sets: Optional[Dict[str, frozenset]] = None,
+                              scoring_cfg: Optional[ScoringCfg] = None) -> Tuple[Dict[str, float], Dict[str, dict]]:
+    # cat_sets / scoring_cfg можно собрать заранее; без них берутся из cfg как раньше
+    rates = scoring_cfg if scoring_cfg is not None else ScoringCfg.from_rates(cfg["rates"])
+    cats = cat_sets if cat_sets is not None else build_cat_sets(cfg)
 
     benefits: Dict[str, float] = {}
     facts: Dict[str, dict] = {}
 
     # amounts in KZT (упрощение — считаем, что currency=KZT; иначе можно добавить конверсию)
-    tx = tx.copy()
+    # без копии всего tx: нужна только обрезанная колонка сумм
     if "currency" in tx.columns:
         # тут можно вставить конверсию, если будет таблица курсов в cfg
         pass
-    tx["amount_kzt"] = tx["amount"].clip(lower=0)
+    amount_kzt = tx["amount"].clip(lower=0)
 
-    total_spend = tx["amount_kzt"].sum()
-    cat_spend = tx.groupby("category")["amount_kzt"].sum().to_dict()
+    total_spend = amount_kzt.sum()
+    # Series, а не dict: корзины категорий суммируются через reindex
+    cat_spend = amount_kzt.groupby(tx["category"], observed=True).sum()
+    cat_spend.index = cat_spend.index.astype(object)
+
+    # суммы по корзинам считает pandas, арифметику по продуктам — _score_kernel
+    travel_spend = _bucket_spend(cat_spend, cats["travel"])
+    avg_bal = float(client_row.get("avg_monthly_balance_KZT", 0))
+    boosted_spend = _bucket_spend(cat_spend, cats["premium_boosted"])
+
+    # credit card: топ-3 категории + онлайн вне топ-3
+    top3 = cat_spend.nlargest(3)
+    top3_spend = float(top3.sum())
+    top3_cats = set(top3.index)
+    online_extra = _bucket_spend(cat_spend, cats["online"] - top3_cats)
+
+    # FX
+    # один value_counts по типам переводов вместо нескольких проходов isin
+    tcounts = tr["type"].value_counts().to_dict() if tr is not None and not tr.empty else {}
+    fx_ops = sum(tcounts.get(t, 0) for t in FX_OPS_TYPES)
+    fx_vol = 0.0
+    if tcounts:
+        fx_vol = float(tr.loc[tr["type"].isin(FX_TYPES), "amount"].sum())
+
+    (travel_cashback, premium_cb, base, cc_cb, fx_saving,
+     dep_multi, dep_save, dep_acc) = _score_kernel(travel_spend, boosted_spend, float(total_spend),
+                                                   top3_spend + online_extra, fx_vol, avg_bal, rates.as_tuple())
 
-    # travel card
-    travel_spend = sum(cat_spend.get(c, 0) for c in cats["travel"])
-    travel_cashback = rates["travel_cashback"] * travel_spend
     benefits["Карта для путешествий"] = travel_cashback
     facts["Карта для путешествий"] = {"travel_spend": travel_spend}
 
-    # premium card
-    avg_bal = float(client_row.get("avg_monthly_balance_KZT", 0))
-    base = rates["premium"]["base_default"]
-    if 1_000_000 <= avg_bal < 6_000_000:
-        base = rates["premium"]["base_mid"]
-    elif avg_bal >= 6_000_000:
-        base = rates["premium"]["base_high"]
-    boosted_spend = sum(cat_spend.get(c, 0) for c in cats["premium_boosted"])
-    boosted_cb = rates["premium"]["boosted_categories_rate"] * boosted_spend
-    other_spend = max(total_spend - boosted_spend, 0)
-    other_cb = base * other_spend
-    premium_cb = min(boosted_cb + other_cb, rates["premium"]["cashback_cap_month"])
     benefits["Премиальная карта"] = premium_cb
     facts["Премиальная карта"] = {"avg_balance": avg_bal, "boosted_spend": boosted_spend, "total_spend": total_spend, "rate": base}
 
-    # credit card
-    items = sorted(cat_spend.items(), key=lambda x: x[1], reverse=True)
-    top3 = items[:3]
-    top3_spend = sum(v for _, v in top3)
-    top3_cats = {c for c,_ in top3}
-    online_extra = sum(cat_spend.get(c, 0) for c in set(cats["online"]) - top3_cats)
-    cc_cb = rates["credit_card"]["fav_rate"] * (top3_spend + online_extra)
     benefits["Кредитная карта"] = cc_cb
-    facts["Кредитная карта"] = {"top3": [c for c,_ in top3], "top3_spend": top3_spend}
+    facts["Кредитная карта"] = {"top3": top3.index.tolist(), "top3_spend": top3_spend}
 
-    # FX
-    fx_ops = 0
-    fx_vol = 0.0
-    if tr is not None and not tr.empty:
-        fx_ops = tr["type"].isin(["fx_buy","fx_sell","deposit_fx_topup_out","deposit_fx_withdraw_in"]).sum()
-        fx_vol = tr.loc[tr["type"].isin(["fx_buy","fx_sell"]), "amount"].sum()
-    fx_saving = rates["fx_saving_rate"] * fx_vol
     benefits["Обмен валют"] = fx_saving
     facts["Обмен валют"] = {"fx_volume_est": fx_vol, "fx_ops": int(fx_ops)}
 
@@ -67,10 +140,6 @@ def compute_expected_benefits(client_row: pd.Series,
     benefits["Кредит наличными"] = 0.0
     facts["Кредит наличными"] = {}
 
-    # deposits (на 3 месяца)
-    dep_multi = rates["deposits"]["multi"] * avg_bal / 12.0 * 3
-    dep_save = rates["deposits"]["save"] * avg_bal / 12.0 * 3
-    dep_acc  = rates["deposits"]["accum"] * avg_bal / 12.0 * 3
     benefits["Депозит Мультивалютный"] = dep_multi
     benefits["Депозит Сберегательный"] = dep_save
     benefits["Депозит Накопительный"]  = dep_acc
@@ -79,8 +148,8 @@ def compute_expected_benefits(client_row: pd.Series,
     facts["Депозит Накопительный"]  = {"avg_balance": avg_bal}
 
     # invest / gold — сигнал присутствия
-    invest_signal = 1 if (tr is not None and not tr.empty and tr["type"].isin(["invest_in","invest_out"]).any()) else 0
-    gold_signal   = 1 if (tr is not None and not tr.empty and tr["type"].isin(["gold_buy_out","gold_sell_in"]).any()) else 0
+    invest_signal = 1 if any(tcounts.get(t, 0) for t in INVEST_TYPES) else 0
+    gold_signal   = 1 if any(tcounts.get(t, 0) for t in GOLD_TYPES) else 0
     benefits["Инвестиции"] = 1000 * invest_signal
     benefits["Золотые слитки"] = 1000 * gold_signal
     facts["Инвестиции"] = {"signal": invest_signal}
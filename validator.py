@@ -1,44 +1,52 @@
 # -*- coding: utf-8 -*-
 import re
+import pandas as pd
+
+# регулярки компилируем один раз: validate_push/autocorrect зовутся до 3 раз на клиента
+_CAPS_RE = re.compile(r"[A-ZА-Я]{4,}")
+_CTA_RE = re.compile(r"(?:Открыть|Настроить|Посмотреть|Оформить сейчас|Оформить карту|Открыть вклад|Открыть счёт)")
+_BANGS_RE = re.compile(r"!{2,}")
+_CAPS_WORD_RE = re.compile(r"\b[A-ZА-Я]{4,}\b")
+# все формы «вы» одной альтернацией; \b отделяет слово и от пробелов, и от знаков препинания
+_VY_RE = re.compile(r"\b(?:вы|вас|вам|вами|ваш(?:а|е|и|ей|его|ему|им|ими)?)\b", re.IGNORECASE)
+
+# допускаем небольшой люфт вокруг 180–220
+_MIN_LEN, _MAX_LEN = 160, 240
+_LEN_RE = re.compile(rf"\A.{{{_MIN_LEN},{_MAX_LEN}}}\Z", re.S)
+# два «!» в любом месте — уже больше одного
+_MANY_BANGS_RE = re.compile(r"!.*!", re.S)
+
+# единый набор правил для validate_push и validate_push_batch:
+# (флаг, регулярка, нарушение при совпадении?, замечание; {n} — длина текста)
+_RULES = (
+    ("len_bad", _LEN_RE, False, "Длина {n} символов (нужно 180–220)."),
+    ("caps", _CAPS_RE, True, "Обнаружен КАПС подряд 4+ символа."),
+    ("no_vy", _VY_RE, False, "Нет обращения на «вы» (в любом месте)."),
+    ("bangs", _MANY_BANGS_RE, True, "Слишком много «!» (макс. 1)."),
+    ("no_cta", _CTA_RE, False, "Нет CTA из списка."),
+)
 
 def validate_push(text: str) -> dict:
-    issues = []
-
-    # длина
-    n = len(text)
-    if n < 160 or n > 240:  # допускаем небольшой люфт вокруг 180–220
-        issues.append(f"Длина {n} символов (нужно 180–220).")
-
-    # капс (жёстко)
-    if re.search(r"[A-ZА-Я]{4,}", text):
-        issues.append("Обнаружен КАПС подряд 4+ символа.")
-
-    # обращение на «вы» (любые формы)
-    text_lower = " " + text.lower() + " "
-    if not any(form in text_lower for form in [" вы ", " вас ", " вам ", " вами ", " ваш ", " ваша ", " ваше ", " ваши ", " вашей ", " вашего ", " вашему ", " вашим ", " вашими "]):
-        issues.append("Нет обращения на «вы» (в любом месте).")
-
-    # максимум 1 восклицательный
-    if text.count("!") > 1:
-        issues.append("Слишком много «!» (макс. 1).")
-
-    # CTA (хотя бы одно из)
-    if not re.search(r"(Открыть|Настроить|Посмотреть|Оформить сейчас|Оформить карту|Открыть вклад|Открыть счёт)", text):
-        issues.append("Нет CTA из списка.")
-
-    # валюта формат «27 400 ₸» (проверяем наличие символа ₸)
-    if "₸" in text:
-        pass
-
+    issues = [msg.format(n=len(text)) for _, rx, bad_if_found, msg in _RULES
+              if bool(rx.search(text)) == bad_if_found]
     return {"ok": len(issues) == 0, "issues": issues}
 
+def validate_push_batch(texts) -> pd.DataFrame:
+    """Те же правила _RULES, что у validate_push, но сразу для колонки текстов: по флагу нарушения на правило + ok."""
+    # любые не-строки (числа, bytes) приводим к str, чтобы .str не давал NaN
+    s = pd.Series(texts, dtype=object).fillna("").astype(str)
+    # каждое правило — один проход .str по всей колонке вместо вызова validate_push на строку
+    flags = pd.DataFrame({flag: s.str.contains(rx) == bad_if_found
+                          for flag, rx, bad_if_found, _ in _RULES}, index=s.index)
+    flags["ok"] = ~flags.any(axis=1)
+    return flags
+
 def autocorrect(text: str) -> str:
-    import re
     t = text.strip()
-    t = re.sub(r"!{2,}", "!", t)
+    t = _BANGS_RE.sub("!", t)
     def lower_long_caps(m):
         return m.group(0).lower().capitalize()
-    t = re.sub(r"\b[A-ZА-Я]{4,}\b", lower_long_caps, t)
+    t = _CAPS_WORD_RE.sub(lower_long_caps, t)
     if len(t) > 220:
         t = t[:220].rstrip(" ,.;")
     return t
@@ -9,33 +9,64 @@ import pandas as pd
 import json
 import os
 from datetime import datetime
-from model_interface import ModelInterface
-from data_loader import load_clients, load_client_tables
+from functools import lru_cache
+from model_interface import get_interface
+from data_loader import load_clients, load_client, get_client_tx, get_client_tr
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-here'
 
-# Initialize model interface
-interface = ModelInterface()
+# Serialize JSON responses with orjson when available (optional dependency)
+try:
+    import orjson
+    from flask.json.provider import DefaultJSONProvider
+
+    class OrjsonProvider(DefaultJSONProvider):
+        def dumps(self, obj, **kwargs):
+            option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+            if kwargs.get('sort_keys', self.sort_keys):
+                option |= orjson.OPT_SORT_KEYS
+            return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
 
-# Load client data
-clients_data = None
-tables_data = None
+    app.json = OrjsonProvider(app)
+except ImportError:
+    pass
 
-def load_data():
-    """Load client and transaction data"""
-    global clients_data, tables_data
+# Initialize model interface
+interface = get_interface()
+
+# Data is loaded lazily on first use and memoized; call .cache_clear() to reload
+@lru_cache(maxsize=1)
+def get_clients_data():
+    """Load client profiles"""
     try:
         clients_data = load_clients("data/clients.csv")
-        tables_data = load_client_tables()
         print(f"Loaded {len(clients_data)} clients")
+        return clients_data
     except Exception as e:
         print(f"Error loading data: {e}")
-        clients_data = pd.DataFrame()
-        tables_data = {}
+        return pd.DataFrame()
+
+@lru_cache(maxsize=10000)
+def get_client_tables(client_id):
+    """Load transactions and transfers of a single client"""
+    return {client_id: load_client(client_id)}
 
-# Load data on startup
-load_data()
+def monthly_spending(tx):
+    """Spending per month as {"YYYY-MM": amount}, plus "unknown" for unparsed dates"""
+    # Group on an integer year*12+month code; format keys as strings only for the JSON output
+    dates = tx['date']
+    ym = (dates.dt.year * 12 + dates.dt.month - 1).rename('ym')
+    totals = tx['amount'].groupby(ym).sum()
+    spending = {f"{code // 12:04d}-{code % 12 + 1:02d}": float(total) for code, total in zip(totals.index.astype(int), totals.to_numpy())}
+    # Rows whose date could not be parsed go under an explicit key, so the months add up to total_amount
+    unparsed = dates.isna()
+    if unparsed.any():
+        spending['unknown'] = float(tx['amount'][unparsed].sum())
+    return spending
 
 @app.route('/')
 def index():
@@ -45,25 +76,26 @@ def index():
 @app.route('/clients')
 def get_clients():
     """Get list of all clients"""
+    clients_data = get_clients_data()
     if clients_data is None or clients_data.empty:
         return jsonify({'error': 'No client data available'})
     
-    clients_list = []
-    for _, row in clients_data.iterrows():
-        clients_list.append({
-            'client_code': int(row['client_code']),
-            'name': row['name'],
-            'status': row['status'],
-            'age': int(row['age']) if pd.notna(row['age']) else 0,
-            'city': row['city'],
-            'avg_balance': float(row['avg_monthly_balance_KZT'])
-        })
+    # Coerce whole columns once and serialize in one call instead of iterrows
+    clients_list = pd.DataFrame({
+        'client_code': clients_data['client_code'].astype(int),
+        'name': clients_data['name'],
+        'status': clients_data['status'],
+        'age': clients_data['age'].fillna(0).astype(int),
+        'city': clients_data['city'],
+        'avg_balance': clients_data['avg_monthly_balance_KZT'].astype(float)
+    }).to_dict(orient='records')
     
     return jsonify({'clients': clients_list})
 
 @app.route('/client/<int:client_id>')
 def get_client_details(client_id):
     """Get detailed client information"""
+    clients_data = get_clients_data()
     if clients_data is None or clients_data.empty:
         return jsonify({'error': 'No client data available'})
     
@@ -75,8 +107,9 @@ def get_client_details(client_id):
     client_row = client_row.iloc[0]
     
     # Get transaction and transfer data
-    tx = tables_data.get(client_id, {}).get("tx", pd.DataFrame())
-    tr = tables_data.get(client_id, {}).get("tr", pd.DataFrame())
+    tables_data = get_client_tables(client_id)
+    tx = get_client_tx(tables_data, client_id)
+    tr = get_client_tr(tables_data, client_id)
     
     # Prepare client info
     client_info = {
@@ -94,8 +127,8 @@ def get_client_details(client_id):
         tx_summary = {
             'total_transactions': len(tx),
             'total_amount': float(tx['amount'].sum()),
-            'categories': tx['category'].value_counts().to_dict(),
-            'monthly_spending': tx.groupby(tx['date'].str[:7])['amount'].sum().to_dict() if 'date' in tx.columns else {}
+            'categories': tx['category'].value_counts().loc[lambda s: s > 0].to_dict(),
+            'monthly_spending': monthly_spending(tx) if 'date' in tx.columns else {}
         }
     
     # Prepare transfer summary
@@ -103,8 +136,8 @@ def get_client_details(client_id):
     if not tr.empty:
         tr_summary = {
             'total_transfers': len(tr),
-            'transfer_types': tr['type'].value_counts().to_dict(),
-            'directions': tr['direction'].value_counts().to_dict() if 'direction' in tr.columns else {}
+            'transfer_types': tr['type'].value_counts().loc[lambda s: s > 0].to_dict(),
+            'directions': tr['direction'].value_counts().loc[lambda s: s > 0].to_dict() if 'direction' in tr.columns else {}
         }
     
     return jsonify({
@@ -125,6 +158,9 @@ def generate_recommendation():
         return jsonify({'error': 'Client ID is required'})
     
     # Find client
+    clients_data = get_clients_data()
+    if clients_data.empty:
+        return jsonify({'error': 'No client data available'})
     client_row = clients_data[clients_data['client_code'] == client_id]
     if client_row.empty:
         return jsonify({'error': 'Client not found'})
@@ -132,8 +168,9 @@ def generate_recommendation():
     client_row = client_row.iloc[0]
     
     # Get transaction and transfer data
-    tx = tables_data.get(client_id, {}).get("tx", pd.DataFrame())
-    tr = tables_data.get(client_id, {}).get("tr", pd.DataFrame())
+    tables_data = get_client_tables(client_id)
+    tx = get_client_tx(tables_data, client_id)
+    tr = get_client_tr(tables_data, client_id)
     
     try:
         # Generate recommendation
@@ -168,11 +205,25 @@ def batch_process():
             output_path="out/batch_results.csv"
         )
         
-        return jsonify({
+        response = {
             'success': True,
             'message': f'Processed {len(results_df)} clients',
             'download_url': '/download/batch_results.csv'
-        })
+        }
+        # Columnar copy of the results for re-reading without CSV parsing (needs pyarrow)
+        parquet_path = "out/batch_results.parquet"
+        tmp_path = parquet_path + ".tmp"
+        try:
+            results_df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, parquet_path)
+            response['parquet_url'] = '/download/batch_results.parquet'
+        except (ImportError, OSError, ValueError):
+            # A copy from an earlier run would no longer match the CSV
+            for path in (tmp_path, parquet_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        
+        return jsonify(response)
     
     except Exception as e:
         return jsonify({